@@ -1,4 +1,3 @@
-from functools import total_ordering
 import os
 import argparse
 
@@ -28,27 +27,17 @@ def env_default(envvar):
     return wrapper
 
 
+TRUE_VALUES = frozenset(("y", "yes", "t", "true", "on", "1"))
+FALSE_VALUES = frozenset(("n", "no", "f", "false", "off", "0"))
+
+
 def strtobool(val):
     # from https://github.com/python/cpython/blob/main/Lib/distutils/util.py#L308
     # since distutils is scheduled for removal
     val = val.lower()
-    if val in ("y", "yes", "t", "true", "on", "1"):
+    if val in TRUE_VALUES:
         return True
-    elif val in ("n", "no", "f", "false", "off", "0"):
+    elif val in FALSE_VALUES:
         return False
     else:
         raise ValueError("invalid truth value %r" % (val,))
-
-
-@total_ordering
-class hdict(dict):
-    def __hash__(self):
-        return hash(frozenset(self))
-
-    def __lt__(self, other):
-        # concatenate keys and values for ordering
-        keys = sorted(self.keys())
-        other_keys = sorted(other.keys())
-        return sorted(f"{k}-{self[k]}" for k in keys) < sorted(
-            f"{k}-{other[k]}" for k in other_keys
-        )
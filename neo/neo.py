@@ -1,52 +1,186 @@
 #!/usr/bin/env python3
 
-from collections import defaultdict
 import os
 import argparse
 import fnmatch
+import functools
+import itertools
 import logging
-import requests
 import json
 import re
-from urllib.parse import quote_plus
+import sys
+from typing import Union
+from urllib.parse import parse_qsl, quote_plus, urlencode, urlsplit, urlunsplit
 
-from common import env_default, hdict, strtobool
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
 
+from common import env_default, strtobool
 
-def update_matches(files, include_regex, old_matches=defaultdict(set), ):
+try:
+    # linear-time matching of the default patterns, when available
+    import re2
+except ImportError:
+    re2 = None
+
+try:
+    # faster parsing of compare responses and serialization of the matrix, when available
+    from orjson import dumps as json_dumpb, loads as json_loads
+
+except ImportError:
+    from json import loads as json_loads
+
+    def json_dumpb(obj) -> bytes:
+        return json.dumps(obj).encode()
+
+# number of GitHub API pages fetched concurrently
+MAX_WORKERS = 4
+
+
+def update_matches(filenames, statuses, include_regex, old_matches=None):
     """
     The update_matches function takes a list of files and their statuses,
-    and returns a dictionary mapping the job matrix keys to sets of statuses.
+    and returns a dictionary mapping the job matrix keys to their status, or
+    "updated" when their files have different statuses.
+    Keys are the tuples of the named groups values, in the order of the pattern,
+    or the filenames when the pattern has no named groups.
     For example:
 
-    :param old_matches: old matches object to update
-    :param files: Store the files that are found in the directory
+    :param old_matches: old matches object to update, their statuses take precedence
+    :param filenames: Store the files that are found in the directory
+    :param statuses: Statuses of the files, in the same order as filenames
     :param include_regex: Filter the files that are included in the job matrix
-    :return: A dictionary of dictionaries
+    :return: A dictionary of statuses
     """
-    matches = defaultdict(set)
-    for (filename, status) in files:
-        match = include_regex.match(filename)
+    if old_matches is None:
+        old_matches = {}
+    matches = {}
+    indices = tuple(include_regex.groupindex.values())
+    # match.groups() is already the key, unless the pattern also has unnamed groups
+    all_named = len(indices) == include_regex.groups
+    # map the bound match method over the filenames, without a Python-level call per file
+    for (match, status) in zip(map(include_regex.match, filenames), statuses):
         if match:
-            if match.groupdict():
-                if "reason" in match.groupdict().keys():
-                    raise ValueError("reason is a reserved name for the job matrix")
-                key = hdict(match.groupdict())
+            if not indices:
+                key = match.string
+            elif all_named:
+                key = match.groups()
             else:
-                key = hdict({"path": filename})
-            if key in list(old_matches.keys()):
-                status = old_matches.pop(key).pop()
-            matches[key].add(status)
+                key = tuple(map(match.group, indices))
+            if key in old_matches:
+                # keep the status of the changed files, no need to accumulate more
+                matches[key] = old_matches[key]
+            elif (current := matches.get(key)) is None:
+                matches[key] = status
+            elif current != status:
+                matches[key] = "updated"
 
     return matches
 
 
+def walk_files(root: str, prefix: str = "", path: str = ""):
+    """
+    The walk_files function recursively lists the files below root, yielding
+    their paths relative to root. Symbolic links to directories are not
+    followed, and unreadable directories are skipped, like os.walk does.
+    Directories that cannot contain paths starting with prefix are not walked.
+
+    :param root:str: Directory to walk
+    :param prefix:str: Only yield the paths starting with this prefix
+    :param path:str: Relative path of root, prepended to the yielded paths
+    :return: A generator of relative file paths
+    """
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            # e.g. a symlink loop, listed as a file like os.walk does
+            is_dir = False
+        if is_dir:
+            dirname = f"{path}{entry.name}/"
+            if not entry.is_symlink() and (
+                dirname.startswith(prefix) or prefix.startswith(dirname)
+            ):
+                yield from walk_files(entry.path, prefix, dirname)
+        else:
+            filename = path + entry.name
+            if filename.startswith(prefix):
+                yield filename
+
+
+@functools.lru_cache(maxsize=None)
+def compile_pattern(pattern: str) -> re.Pattern:
+    """
+    The compile_pattern function compiles the include pattern, caching the result
+    so that repeated calls with the same pattern don't compile it again.
+
+    :param pattern:str: Regex pattern
+    :return: The compiled regex
+    """
+    return re.compile(pattern)
+
+
+@functools.lru_cache(maxsize=None)
+def literal_prefix(include_regex: re.Pattern) -> str:
+    """
+    The literal_prefix function returns the literal string any match of the
+    pattern has to start with, e.g. "clusters/" for clusters/(?P<env>\\w+)/.*
+    Filenames that don't start with it can be skipped without running the regex.
+
+    :param include_regex:re.Pattern: Compiled regex
+    :return: The literal prefix of the pattern, possibly empty
+    """
+    if include_regex.flags & re.IGNORECASE:
+        return ""
+    prefix = []
+    for index, (op, av) in enumerate(
+        sre_parse.parse(include_regex.pattern, include_regex.flags)
+    ):
+        if op is sre_parse.AT and av is sre_parse.AT_BEGINNING and not index:
+            continue
+        if op is not sre_parse.LITERAL:
+            break
+        prefix.append(chr(av))
+    return "".join(prefix)
+
+
+@functools.lru_cache(maxsize=None)
+def default_patterns_regex(default_patterns: tuple) -> re.Pattern:
+    """
+    The default_patterns_regex function translates UNIX-style glob patterns into
+    a single compiled regex matching any of them, so that changed files can be
+    checked against all default patterns in one pass.
+    When google-re2 is installed and supports the translated patterns, it is used
+    to match them all in linear time.
+
+    :param default_patterns:tuple: UNIX-style glob patterns
+    :return: A compiled regex matching any of the glob patterns
+    """
+    translated = [fnmatch.translate(pattern) for pattern in default_patterns]
+    # Python 3.11+ translates globs with several * into atomic groups and lookaheads,
+    # which RE2 doesn't support; it would also log a parse error to stderr on them
+    if re2 is not None and not any("(?>" in t or "(?=" in t for t in translated):
+        try:
+            # fnmatch anchors the end of the text with \Z, which RE2 spells \z
+            re2_translated = [re.sub(r"\\Z$", r"\\z", t) for t in translated]
+            return re2.compile("|".join(f"(?:{t})" for t in re2_translated))
+        except re2.error:
+            logging.debug("Default patterns not supported by RE2, falling back to re")
+    return re.compile("|".join(f"(?:{t})" for t in translated))
+
+
 def generate_matrix(
     files: list,
-    include_regex: str,
+    include_regex: Union[str, re.Pattern],
     defaults: bool = False,
     default_patterns: list = None,
-    default_dir: str = os.getenv("GITHUB_WORKSPACE", os.curdir),
+    default_dir: str = None,
 ) -> list:
     """
     The generate_matrix function takes a list of files and returns a matrix of
@@ -55,50 +189,113 @@ def generate_matrix(
     include_regex is provided, all changed files are included in the matrix.
 
     :param files: Pass in the list of files that were changed
-    :param include_regex:str: Indicate that the regex should be matched against the filename,
+    :param include_regex:Union[str, re.Pattern]: Regex pattern, or an already compiled one which is
+    used as-is, skipping the compile cache. It is matched from the start of each filename
+    (add $ to anchor it at the end). Indicate that the regex should be matched against the filename,
     Filter the files that are included in the matrix Define the pattern that is used to filter the files
     :param defaults: Determine if the default patterns should be used
     :param default_patterns: Provide a list of default patterns that will be used to determine
     if the matrix should be generated Define the pattern that is used to filter the files
-    :param default_dir: Specify the root directory of the repository or use the current directory
+    :param default_dir: Specify the root directory of the repository, defaults to $GITHUB_WORKSPACE
+    or the current directory
     :return: A list of dictionaries
     """
     if default_patterns is None:
         default_patterns = []
-    include_regex = re.compile(include_regex, re.M | re.S)
-    changed_files = [(e["filename"], e["status"]) for e in files]
+    if default_dir is None:
+        default_dir = os.getenv("GITHUB_WORKSPACE", os.curdir)
+    if isinstance(include_regex, str):
+        include_regex = compile_pattern(include_regex)
+    if "reason" in include_regex.groupindex:
+        raise ValueError("reason is a reserved name for the job matrix")
+    # filenames are deduplicated (e.g. when repeated across pages), and their statuses
+    # kept apart, so that every pass reads only what it needs
+    changes = {}
+    for e in files:
+        if changes.setdefault(e["filename"], e["status"]) != e["status"]:
+            changes[e["filename"]] = "updated"
+    filenames = changes.keys()
+    file_statuses = changes.values()
 
     # check if changed files match the so-called default patterns
-    matched_default_patterns = [
-        pattern
-        for pattern in default_patterns
-        if fnmatch.filter((c for c, _ in changed_files), pattern)
-    ]
-
-    if matched_default_patterns:
-        logging.info("Files changed in defaults patterns: %s", matched_default_patterns)
+    matched_default_patterns = False
+    if default_patterns:
+        default_regex = default_patterns_regex(tuple(default_patterns))
+        matched_default_patterns = any(map(default_regex.match, filenames))
+
+    # only resolve which patterns matched when it is actually going to be logged
+    if matched_default_patterns and logging.getLogger().isEnabledFor(logging.INFO):
+        # a match only tells its first matching alternative, so check every pattern
+        logging.info(
+            "Files changed in defaults patterns: %s",
+            [
+                pattern
+                for pattern in default_patterns
+                if any(fnmatch.fnmatchcase(c, pattern) for c in filenames)
+            ],
+        )
 
-    matches = update_matches(changed_files, include_regex)
+    matches = update_matches(filenames, file_statuses, include_regex)
 
     # if nothing changed, list all files/directories
     if (not matches and defaults) or matched_default_patterns:
         logging.info(
             "Listing all files/directories in repository matching the provided pattern"
         )
-        default_files = [
-            (os.path.relpath(os.path.join(path, f), default_dir), "default")
-            for path, _, files in os.walk(default_dir)
-            for f in files
-        ]
-        matches = update_matches( default_files, include_regex, matches)
+        # cheap rejection of the files that cannot match before running the regex
+        default_files = walk_files(default_dir, literal_prefix(include_regex))
+        matches = update_matches(
+            default_files, itertools.repeat("default"), include_regex, matches
+        )
     # mark matrix entries with a status if all its matches have the same status
+    names = tuple(include_regex.groupindex)
+    if names:
+        # groups that didn't participate in the match are None, sort them first
+        keys = sorted(matches, key=lambda key: tuple(v or "" for v in key))
+    else:
+        keys = sorted(matches)
     status_matrix = []
-    for (groups, statuses) in matches.items():
-        groups["reason"] = statuses.pop() if len(statuses) == 1 else "updated"
+    for key in keys:
+        groups = dict(zip(names, key)) if names else {"path": key}
+        groups["reason"] = matches[key]
         status_matrix.append(groups)
 
-    # convert back to a dict (hashable, serializable)
-    return sorted(status_matrix)
+    return status_matrix
+
+
+def get_files(session, url: str) -> tuple:
+    """
+    The get_files function requests a page of a GitHub compare response and
+    decodes its body once, returning the response (for its pagination links)
+    along with the list of changed files it contains.
+
+    :param session:requests.Session: Session to send the request with, reusing its connections
+    :param url:str: URL of the compare page
+    :return: A tuple of the response and its list of changed files
+    """
+    r = session.get(url)
+    r.raise_for_status()
+    return r, json_loads(r.content).get("files", [])
+
+
+def page_urls(last_page_url: str) -> list:
+    """
+    The page_urls function takes the URL of the last page of a paginated GitHub
+    API response, as found in its Link header, and returns the URLs of all the
+    pages following the first one.
+
+    :param last_page_url:str: URL of the last page
+    :return: A list of URLs for pages 2 to the last page, empty if the page number is unknown
+    """
+    scheme, netloc, path, query, fragment = urlsplit(last_page_url)
+    params = dict(parse_qsl(query))
+    if not params.get("page", "").isdigit():
+        return []
+    last_page = int(params["page"])
+    return [
+        urlunsplit((scheme, netloc, path, urlencode({**params, "page": page}), fragment))
+        for page in range(2, last_page + 1)
+    ]
 
 
 def main(
@@ -112,14 +309,31 @@ def main(
     per_page: int = 0,
 ):
 
+    # imported here to keep the CLI startup (e.g. --help) light
+    from concurrent.futures import ThreadPoolExecutor
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
     if default_patterns is None:
         default_patterns = []
     with requests.session() as session:
-        session.hooks = {
-            "response": lambda resp, *resp_args, **kwargs: resp.raise_for_status()
-        }
+        # reuse a single keep-alive connection across pages, and retry transient errors
+        session.mount(
+            "https://",
+            HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=MAX_WORKERS,
+                max_retries=Retry(
+                    total=5, backoff_factor=0.25, status_forcelist=[502, 503, 504]
+                ),
+            ),
+        )
         # see: https://docs.github.com/en/actions/security-guides/automatic-token-authentication
         session.headers["Authorization"] = f"token {github_token}"
+        # see: https://docs.github.com/en/rest/overview/media-types
+        session.headers["Accept"] = "application/vnd.github+json"
+        session.headers["X-GitHub-Api-Version"] = "2022-11-28"
         if per_page:
             session.params = {"per_page": per_page}
 
@@ -127,17 +341,26 @@ def main(
             f"https://api.github.com/repos/{github_repository}"
             f"/compare/{quote_plus(github_base_ref)}...{quote_plus(github_head_ref)}"
         )
-        logging.info(f"GitHub API request: {compare_url}")
-
-        r = session.get(compare_url)
-        files = r.json().get("files", [])
+        logging.info("GitHub API request: %s", compare_url)
+
+        r, files = get_files(session, compare_url)
+        if "last" in r.links and (urls := page_urls(r.links["last"]["url"])):
+            # the number of pages is known, fetch them concurrently
+            logging.info("Loading %d more pages", len(urls))
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                for r, page_files in executor.map(
+                    functools.partial(get_files, session), urls
+                ):
+                    files.extend(page_files)
         while link := r.links.get("next"):
             next_page_url = link["url"]
-            logging.info(f"Loading next page: {next_page_url}")
-            r = session.get(next_page_url)
-            files.extend(r.json().get("files", []))
+            logging.info("Loading next page: %s", next_page_url)
+            r, page_files = get_files(session, next_page_url)
+            files.extend(page_files)
 
-    return generate_matrix(files, include_regex, defaults, default_patterns)
+    return generate_matrix(
+        files, compile_pattern(include_regex), defaults, default_patterns
+    )
 
 
 def github_webhook_ref(dest: str, option_strings: list):
@@ -185,19 +408,27 @@ def github_webhook_ref(dest: str, option_strings: list):
     )
 
 
-def set_github_actions_output(generated_matrix: list) -> None:
+def set_github_actions_output(generated_matrix: list, file=None) -> None:
     """
     The set_github_actions_output function is used to generate the output for GitHub Actions.
-    It takes in a list of dictionaries and prints out two environment variables: matrix, which contains
+    It takes in a list of dictionaries and writes out two outputs: matrix, which contains
     the JSON representation of the matrix, and matrix-length, which contains an integer representing
-    the number of rows in the matrix.
+    the number of rows in the matrix. Outputs are written to file when given, otherwise appended
+    to the $GITHUB_OUTPUT file in a single write, or printed to stdout when it is not set.
 
     :param generated_matrix:List[dict]: Pass the generated matrix to the function
+    :param file: Text stream to write the outputs to instead
     :return: The generated matrix in a format that can be used by the github actions workflow
     """
-    files_json = json.dumps({"include": generated_matrix})
-    print(f"matrix={files_json}")
-    print(f"matrix-length={len(generated_matrix)}")
+    # the JSON is serialized on a single line, no multiline delimiter is needed
+    files_json = json_dumpb({"include": generated_matrix})
+    payload = b"matrix=%b\nmatrix-length=%d\n" % (files_json, len(generated_matrix))
+    github_output = os.getenv("GITHUB_OUTPUT")
+    if file is None and github_output:
+        with open(github_output, "ab") as fp:
+            fp.write(payload)
+    else:
+        (file or sys.stdout).write(payload.decode())
 
 
 if __name__ == "__main__":
@@ -243,7 +474,9 @@ if __name__ == "__main__":
     )
 
     matrix = main(**args)
-    logging.info(matrix)
+    logging.info("Generated a matrix of %d entries", len(matrix))
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("matrix=%r", matrix)
 
     if os.getenv("GITHUB_ACTIONS"):
         set_github_actions_output(matrix)
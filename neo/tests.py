@@ -1,60 +1,240 @@
 #!/usr/bin/env python3
 import neo
 
-import contextlib
 import io
 import json
 import os
+import re
 import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
+
+# changed files shared by the tests, never mutated by generate_matrix
+CLUSTERS_FILES = (
+    {"filename": "clusters/staging/app", "status": "modified"},
+    {"filename": "clusters/live/app", "status": "modified"},
+    {"filename": "clusters/staging/demo", "status": "modified"},
+)
+OTHER_FILE = {"filename": "my_other_file/hello", "status": "modified"}
+
+# (name, include pattern, changed files, expected matrix in output order)
+CASES = [
+    (
+        "no_changes",
+        "clusters/.*",
+        [
+            {"filename": "clusters", "status": "modified"},
+            {"filename": "blah", "status": "modified"},
+        ],
+        [],
+    ),
+    (
+        "groups_level1",
+        r"clusters/(?P<environment>\w+)/.*",
+        CLUSTERS_FILES,
+        [
+            {"environment": "live", "reason": "modified"},
+            {"environment": "staging", "reason": "modified"},
+        ],
+    ),
+    (
+        "groups_level2",
+        r"clusters/(?P<environment>\w+)/(?P<namespace>\w+)",
+        CLUSTERS_FILES,
+        [
+            {"environment": "live", "namespace": "app", "reason": "modified"},
+            {"environment": "staging", "namespace": "app", "reason": "modified"},
+            {"environment": "staging", "namespace": "demo", "reason": "modified"},
+        ],
+    ),
+    (
+        "optional_group_sorted",
+        r"clusters/(?P<environment>\w+)(?:/(?P<namespace>\w+))?$",
+        [
+            {"filename": "clusters/staging/app", "status": "modified"},
+            {"filename": "clusters/staging", "status": "added"},
+            {"filename": "clusters/live/app", "status": "modified"},
+        ],
+        [
+            {"environment": "live", "namespace": "app", "reason": "modified"},
+            {"environment": "staging", "namespace": None, "reason": "added"},
+            {"environment": "staging", "namespace": "app", "reason": "modified"},
+        ],
+    ),
+    (
+        "duplicated_files",
+        "clusters/.*",
+        [
+            {"filename": "clusters/staging/app", "status": "modified"},
+            {"filename": "clusters/live/app", "status": "modified"},
+            {"filename": "clusters/staging/app", "status": "modified"},
+            {"filename": "clusters/staging/demo", "status": "added"},
+            {"filename": "clusters/staging/demo", "status": "removed"},
+        ],
+        [
+            {"path": "clusters/live/app", "reason": "modified"},
+            {"path": "clusters/staging/app", "reason": "modified"},
+            {"path": "clusters/staging/demo", "reason": "updated"},
+        ],
+    ),
+    (
+        "unnamed_groups",
+        r"(clusters|apps)/(?P<environment>\w+)/(\w+)",
+        [
+            {"filename": "clusters/staging/app", "status": "modified"},
+            {"filename": "apps/staging/demo", "status": "modified"},
+            {"filename": "clusters/live/app", "status": "removed"},
+        ],
+        [
+            {"environment": "live", "reason": "removed"},
+            {"environment": "staging", "reason": "modified"},
+        ],
+    ),
+    (
+        "no_group",
+        "clusters/.*",
+        (*CLUSTERS_FILES, OTHER_FILE),
+        [
+            {"path": "clusters/live/app", "reason": "modified"},
+            {"path": "clusters/staging/app", "reason": "modified"},
+            {"path": "clusters/staging/demo", "reason": "modified"},
+        ],
+    ),
+    (
+        "sorted",
+        "clusters/.*",
+        (OTHER_FILE, *CLUSTERS_FILES),
+        [
+            {"path": "clusters/live/app", "reason": "modified"},
+            {"path": "clusters/staging/app", "reason": "modified"},
+            {"path": "clusters/staging/demo", "reason": "modified"},
+        ],
+    ),
+    (
+        "all_matches_removed",
+        r"clusters/(?P<environment>\w+)/.*",
+        [
+            {"filename": "clusters/staging/app", "status": "removed"},
+            {"filename": "clusters/staging/demo", "status": "removed"},
+            {"filename": "clusters/live/app", "status": "modified"},
+        ],
+        [
+            {"environment": "live", "reason": "modified"},
+            {"environment": "staging", "reason": "removed"},
+        ],
+    ),
+    (
+        "one_match_removed",
+        r"clusters/(?P<environment>\w+)/.*",
+        [
+            {"filename": "clusters/staging/app", "status": "removed"},
+            {"filename": "clusters/staging/demo", "status": "modified"},
+            {"filename": "clusters/live/app", "status": "modified"},
+        ],
+        [
+            {"environment": "live", "reason": "modified"},
+            {"environment": "staging", "reason": "updated"},
+        ],
+    ),
+]
 
 
 class TestChangedFiles(unittest.TestCase):
-    def test_no_changes(self):
-        self.assertFalse(
+    @classmethod
+    def setUpClass(cls):
+        # compile the patterns shared by the tests once
+        cls.patterns = {
+            pattern: re.compile(pattern)
+            for pattern in [
+                "clusters/.*",
+                "(?P<environment>staging|live)",
+                r"clusters/(?P<environment>\w+)/.*",
+                r"clusters/(?P<environment>\w+)/(?P<namespace>\w+)",
+                r"clusters/(?P<environment>\w+)(?:/(?P<namespace>\w+))?$",
+                r"(clusters|apps)/(?P<environment>\w+)/(\w+)",
+            ]
+        }
+        # repository checkout shared by the tests of the defaults mode
+        cls.default_dir = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.default_dir.cleanup)
+        for name in ("staging.txt", "live.txt"):
+            Path(cls.default_dir.name, name).touch()
+
+    def test_generate_matrix_cases(self):
+        for name, pattern, files, expected in CASES:
+            with self.subTest(name=name):
+                self.assertListEqual(
+                    neo.generate_matrix(include_regex=self.patterns[pattern], files=files),
+                    expected,
+                )
+
+    def test_no_changes_with_default_pattern(self):
+        self.assertEqual(
             neo.generate_matrix(
-                include_regex="clusters/.*",
+                include_regex=self.patterns["(?P<environment>staging|live)"],
+                default_patterns=["clusters/**"],
+                default_dir=self.default_dir.name,
                 files=[
-                    {"filename": "clusters", "status": "modified"},
                     {"filename": "blah", "status": "modified"},
+                    {"filename": "clusters/sample.json", "status": "modified"},
                 ],
-            )
+            ),
+            [
+                {'environment': 'live', 'reason': 'default'},
+                {'environment': 'staging', 'reason': 'default'}
+            ],
         )
 
-    def test_no_changes_with_default_pattern(self):
-        with tempfile.TemporaryDirectory() as d:
-            Path(os.path.join(d, "staging.txt")).touch()
-            Path(os.path.join(d, "live.txt")).touch()
-            self.assertEqual(
-                neo.generate_matrix(
-                    include_regex="(?P<environment>staging|live)",
-                    default_patterns=["clusters/**"],
-                    default_dir=d,
-                    files=[
-                        {"filename": "blah", "status": "modified"},
-                        {"filename": "clusters/sample.json", "status": "modified"},
-                    ],
-                ),
-                [
-                    {'environment': 'live', 'reason': 'default'},
-                    {'environment': 'staging', 'reason': 'default'}
+    def test_changes_with_default_pattern(self):
+        self.assertEqual(
+            neo.generate_matrix(
+                include_regex=self.patterns["(?P<environment>staging|live)"],
+                default_patterns=["clusters/**"],
+                default_dir=self.default_dir.name,
+                files=[
+                    {"filename": "blah", "status": "modified"},
+                    {"filename": "clusters/sample.json", "status": "modified"},
+                    {"filename": "staging.txt", "status": "modified"},
                 ],
-            )
+            ),
+            [
+                {'environment': 'live', 'reason': 'default'},
+                {'environment': 'staging', 'reason': 'modified'}
+            ],
+        )
 
-    def test_changes_with_default_pattern(self):
+    def test_changes_with_multiple_default_patterns(self):
+        self.assertEqual(
+            neo.generate_matrix(
+                include_regex=self.patterns["(?P<environment>staging|live)"],
+                default_patterns=["clusters/**", "modules/*.tf"],
+                default_dir=self.default_dir.name,
+                files=[
+                    {"filename": "blah", "status": "modified"},
+                    {"filename": "modules/main.tf", "status": "modified"},
+                ],
+            ),
+            [
+                {'environment': 'live', 'reason': 'default'},
+                {'environment': 'staging', 'reason': 'default'}
+            ],
+        )
+
+    def test_changes_with_default_pattern_groups(self):
         with tempfile.TemporaryDirectory() as d:
-            Path(os.path.join(d, "staging.txt")).touch()
-            Path(os.path.join(d, "live.txt")).touch()
+            for environment in ("staging", "live"):
+                os.makedirs(os.path.join(d, "clusters", environment))
+                Path(os.path.join(d, "clusters", environment, "app")).touch()
+                Path(os.path.join(d, "clusters", environment, "demo")).touch()
             self.assertEqual(
                 neo.generate_matrix(
-                    include_regex="(?P<environment>staging|live)",
-                    default_patterns=["clusters/**"],
+                    include_regex=self.patterns[r"clusters/(?P<environment>\w+)/.*"],
+                    default_patterns=["modules/**"],
                     default_dir=d,
                     files=[
-                        {"filename": "blah", "status": "modified"},
-                        {"filename": "clusters/sample.json", "status": "modified"},
-                        {"filename": "staging.txt", "status": "modified"},
+                        {"filename": "modules/main.tf", "status": "modified"},
+                        {"filename": "clusters/staging/app", "status": "modified"},
                     ],
                 ),
                 [
@@ -63,169 +243,282 @@ class TestChangedFiles(unittest.TestCase):
                 ],
             )
 
-    def test_no_changes_with_defaults(self):
-        with tempfile.TemporaryDirectory() as d:
-            Path(os.path.join(d, "staging.txt")).touch()
-            Path(os.path.join(d, "live.txt")).touch()
-            self.assertCountEqual(
-                neo.generate_matrix(
-                    include_regex="(?P<environment>staging|live)",
-                    defaults=True,
-                    default_dir=d,
-                    files=[
-                        {"filename": "clusters", "status": "modified"},
-                        {"filename": "blah", "status": "modified"},
-                    ],
-                ),
-                [
-                    {"environment": "staging", "reason": "default"},
-                    {"environment": "live", "reason": "default"},
-                ],
-            )
-
-    def test_changes_groups_level1(self):
-        self.assertCountEqual(
+    def test_matched_default_patterns_logged(self):
+        with self.assertLogs(level="INFO") as logs:
             neo.generate_matrix(
-                include_regex="clusters/(?P<environment>\w+)/.*",
+                include_regex=self.patterns["(?P<environment>staging|live)"],
+                default_patterns=["clusters/**", "modules/*.tf", "deploy.sh"],
+                default_dir=self.default_dir.name,
                 files=[
-                    {"filename": "clusters/staging/app", "status": "modified"},
-                    {"filename": "clusters/staging/demo", "status": "modified"},
-                    {"filename": "clusters/live/app", "status": "modified"},
+                    {"filename": "deploy.sh", "status": "modified"},
+                    {"filename": "clusters/sample.json", "status": "modified"},
                 ],
-            ),
-            [
-                {"environment": "staging", "reason": "modified"},
-                {"environment": "live", "reason": "modified"},
-            ],
+            )
+        self.assertIn(
+            "Files changed in defaults patterns: ['clusters/**', 'deploy.sh']",
+            "\n".join(logs.output),
         )
 
-    def test_changes_groups_level2(self):
-        self.assertCountEqual(
+    def test_overlapping_default_patterns_logged(self):
+        with self.assertLogs(level="INFO") as logs:
             neo.generate_matrix(
-                include_regex="clusters/(?P<environment>\w+)/(?P<namespace>\w+)",
-                files=[
-                    {"filename": "clusters/staging/app", "status": "modified"},
-                    {"filename": "clusters/live/app", "status": "modified"},
-                    {"filename": "clusters/staging/demo", "status": "modified"},
-                ],
-            ),
-            [
-                {"environment": "staging", "namespace": "app", "reason": "modified"},
-                {"environment": "staging", "namespace": "demo", "reason": "modified"},
-                {"environment": "live", "namespace": "app", "reason": "modified"},
-            ],
+                include_regex=self.patterns["(?P<environment>staging|live)"],
+                default_patterns=["clusters/**", "clusters/*.json"],
+                default_dir=self.default_dir.name,
+                files=[{"filename": "clusters/sample.json", "status": "modified"}],
+            )
+        self.assertIn(
+            "Files changed in defaults patterns: ['clusters/**', 'clusters/*.json']",
+            "\n".join(logs.output),
         )
 
-    def test_changes_no_group(self):
-        self.assertCountEqual(
+    def test_no_changes_with_defaults(self):
+        self.assertListEqual(
             neo.generate_matrix(
-                include_regex="clusters/.*",
+                include_regex=self.patterns["(?P<environment>staging|live)"],
+                defaults=True,
+                default_dir=self.default_dir.name,
                 files=[
-                    {"filename": "clusters/staging/app", "status": "modified"},
-                    {"filename": "clusters/live/app", "status": "modified"},
-                    {"filename": "clusters/staging/demo", "status": "modified"},
-                    {"filename": "my_other_file/hello", "status": "modified"},
+                    {"filename": "clusters", "status": "modified"},
+                    {"filename": "blah", "status": "modified"},
                 ],
             ),
             [
-                {"path": "clusters/staging/app", "reason": "modified"},
-                {"path": "clusters/staging/demo", "reason": "modified"},
-                {"path": "clusters/live/app", "reason": "modified"},
+                {"environment": "live", "reason": "default"},
+                {"environment": "staging", "reason": "default"},
             ],
         )
 
-    def test_changes_sorted(self):
+    def test_walk_files(self):
+        with tempfile.TemporaryDirectory() as d:
+            os.makedirs(os.path.join(d, "clusters", "staging"))
+            Path(os.path.join(d, "clusters", "staging", "app")).touch()
+            Path(os.path.join(d, "deploy.sh")).touch()
+            self.assertCountEqual(
+                neo.walk_files(d),
+                ["clusters/staging/app", "deploy.sh"],
+            )
+
+    def test_walk_files_prefix(self):
+        with tempfile.TemporaryDirectory() as d:
+            for directory in ("clusters/staging", "clusters-old/live", "node_modules/x"):
+                os.makedirs(os.path.join(d, directory))
+                Path(os.path.join(d, directory, "app")).touch()
+            Path(os.path.join(d, "clusters.txt")).touch()
+            with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+                self.assertCountEqual(
+                    neo.walk_files(d, "clusters/"),
+                    ["clusters/staging/app"],
+                )
+            self.assertCountEqual(
+                [call.args[0] for call in scandir.call_args_list],
+                [
+                    d,
+                    os.path.join(d, "clusters"),
+                    os.path.join(d, "clusters", "staging"),
+                ],
+            )
+
+    def test_walk_files_symlinks(self):
+        with tempfile.TemporaryDirectory() as d:
+            os.makedirs(os.path.join(d, "modules"))
+            Path(os.path.join(d, "modules", "main.tf")).touch()
+            os.symlink(os.path.join(d, "modules"), os.path.join(d, "linked-modules"))
+            os.symlink(os.path.join(d, "modules", "main.tf"), os.path.join(d, "main.tf"))
+            os.symlink(os.path.join(d, "selfloop"), os.path.join(d, "selfloop"))
+            self.assertCountEqual(
+                neo.walk_files(d),
+                ["modules/main.tf", "main.tf", "selfloop"],
+            )
+
+    def test_changes_compiled_pattern(self):
+        include_regex = re.compile(r"clusters/(?P<environment>\w+)/.*")
         self.assertListEqual(
             neo.generate_matrix(
-                include_regex="clusters/.*",
-                files=[
-                    {"filename": "my_other_file/hello", "status": "modified"},
-                    {"filename": "clusters/live/app", "status": "modified"},
-                    {"filename": "clusters/staging/app", "status": "modified"},
-                    {"filename": "clusters/staging/demo", "status": "modified"},
-                ],
+                include_regex=include_regex,
+                files=[{"filename": "clusters/staging/app", "status": "modified"}],
             ),
-            [
-                {"path": "clusters/live/app", "reason": "modified"},
-                {"path": "clusters/staging/app", "reason": "modified"},
-                {"path": "clusters/staging/demo", "reason": "modified"},
-            ],
+            [{"environment": "staging", "reason": "modified"}],
         )
-
-    def test_all_matches_removed(self):
-        self.assertCountEqual(
+        self.assertListEqual(
             neo.generate_matrix(
-                include_regex="clusters/(?P<environment>\w+)/.*",
-                files=[
-                    {"filename": "clusters/staging/app", "status": "removed"},
-                    {"filename": "clusters/staging/demo", "status": "removed"},
-                    {"filename": "clusters/live/app", "status": "modified"},
-                ],
+                include_regex=include_regex,
+                files=[{"filename": "clusters/live/app", "status": "removed"}],
             ),
-            [
-                {"environment": "staging", "reason": "removed"},
-                {"environment": "live", "reason": "modified"},
-            ],
+            [{"environment": "live", "reason": "removed"}],
         )
 
-    def test_one_match_removed(self):
-        self.assertCountEqual(
+    def test_pattern_compiled_once(self):
+        for _ in range(2):
+            neo.generate_matrix(include_regex=r"clusters/(?P<cluster>\w+)", files=[])
+        cache_info = neo.compile_pattern.cache_info()
+        neo.generate_matrix(include_regex=r"clusters/(?P<cluster>\w+)", files=[])
+        self.assertEqual(neo.compile_pattern.cache_info().hits, cache_info.hits + 1)
+        self.assertEqual(neo.compile_pattern.cache_info().misses, cache_info.misses)
+
+    def test_reserved_group_name(self):
+        with self.assertRaises(ValueError):
             neo.generate_matrix(
-                include_regex="clusters/(?P<environment>\w+)/.*",
-                files=[
-                    {"filename": "clusters/staging/app", "status": "removed"},
-                    {"filename": "clusters/staging/demo", "status": "modified"},
-                    {"filename": "clusters/live/app", "status": "modified"},
-                ],
-            ),
-            [
-                {"environment": "staging", "reason": "updated"},
-                {"environment": "live", "reason": "modified"},
-            ],
-        )
+                include_regex=r"clusters/(?P<reason>\w+)/.*",
+                files=[],
+            )
 
     def test_github_outputs(self):
         matrix = neo.generate_matrix(
-            include_regex="clusters/.*",
+            include_regex=self.patterns["clusters/.*"],
+            files=(*CLUSTERS_FILES, OTHER_FILE),
+        )
+        f = io.StringIO()
+        neo.set_github_actions_output(matrix, file=f)
+
+        outputs = dict(line.split("=", 1) for line in f.getvalue().splitlines())
+
+        self.assertEqual(json.loads(outputs["matrix"]), {"include": matrix})
+        self.assertEqual(outputs["matrix-length"], "3")
+
+    def test_github_outputs_file(self):
+        matrix = neo.generate_matrix(
+            include_regex=self.patterns["clusters/.*"],
             files=[
                 {"filename": "clusters/staging/app", "status": "modified"},
                 {"filename": "clusters/live/app", "status": "modified"},
-                {"filename": "clusters/staging/demo", "status": "modified"},
-                {"filename": "my_other_file/hello", "status": "modified"},
             ],
         )
-        with contextlib.redirect_stdout(io.StringIO()) as f:
-            neo.set_github_actions_output(matrix)
+        with tempfile.TemporaryDirectory() as d:
+            github_output = os.path.join(d, "output")
+            Path(github_output).write_text("previous=output\n")
+            with mock.patch.dict(os.environ, {"GITHUB_OUTPUT": github_output}):
+                neo.set_github_actions_output(matrix)
 
-        output = f.getvalue()
-        expected_matrix_output = json.dumps({"include": matrix})
+            lines = Path(github_output).read_text().splitlines()
 
-        self.assertIn(f"matrix={expected_matrix_output}", output)
-        self.assertIn(f"matrix-length=3", output)
+        self.assertEqual(lines[0], "previous=output")
+        outputs = dict(line.split("=", 1) for line in lines[1:])
+        self.assertEqual(
+            json.loads(outputs["matrix"]),
+            {
+                "include": [
+                    {"path": "clusters/live/app", "reason": "modified"},
+                    {"path": "clusters/staging/app", "reason": "modified"},
+                ]
+            },
+        )
+        self.assertEqual(outputs["matrix-length"], "2")
 
+    def test_literal_prefix(self):
+        for pattern, prefix in [
+            (r"clusters/(?P<environment>\w+)/.*", "clusters/"),
+            ("^clusters/.*", "clusters/"),
+            ("library/(?P<lib>(?!common)[^/]+)", "library/"),
+            ("clusters?/.*", "cluster"),
+            ("(?P<dir>[^/]+)/", ""),
+            ("staging|live", ""),
+            ("(?i)clusters/.*", ""),
+        ]:
+            with self.subTest(pattern=pattern):
+                self.assertEqual(neo.literal_prefix(re.compile(pattern)), prefix)
 
+    def test_page_urls(self):
+        self.assertListEqual(
+            neo.page_urls(
+                "https://api.github.com/repositories/1/compare/a...b?per_page=1&page=3"
+            ),
+            [
+                "https://api.github.com/repositories/1/compare/a...b?per_page=1&page=2",
+                "https://api.github.com/repositories/1/compare/a...b?per_page=1&page=3",
+            ],
+        )
+        self.assertFalse(
+            neo.page_urls("https://api.github.com/repositories/1/compare/a...b")
+        )
+
+
+# runs main() against canned GitHub API responses, without network access
+class MainTest(unittest.TestCase):
+    compare_url = "https://api.github.com/repos/hellofresh/action-changed-files/compare/base...head"
+    page_url = "https://api.github.com/repositories/1/compare/base...head?per_page=1&page=%d"
+
+    def mock_get(self, pages: dict):
+        def get(session, url, **kwargs):
+            content, links = pages[url]
+            return mock.Mock(content=json.dumps(content).encode(), links=links)
+
+        return mock.patch("requests.Session.get", autospec=True, side_effect=get)
+
+    def main(self, **kwargs):
+        return neo.main("token", "hellofresh/action-changed-files", "base", "head", **kwargs)
+
+    def test_single_page(self):
+        with self.mock_get({self.compare_url: ({"files": list(CLUSTERS_FILES)}, {})}):
+            matrix = self.main(include_regex=r"clusters/(?P<environment>\w+)/.*")
+        self.assertListEqual(
+            matrix,
+            [
+                {"environment": "live", "reason": "modified"},
+                {"environment": "staging", "reason": "modified"},
+            ],
+        )
+
+    def test_pagination_last_link(self):
+        links = {
+            "next": {"url": self.page_url % 2},
+            "last": {"url": self.page_url % 3},
+        }
+        pages = {
+            self.compare_url: ({"files": [CLUSTERS_FILES[0]]}, links),
+            self.page_url % 2: ({"files": [CLUSTERS_FILES[1]]}, {}),
+            self.page_url % 3: ({"files": [CLUSTERS_FILES[2]]}, {}),
+        }
+        with self.mock_get(pages) as get:
+            matrix = self.main(include_regex="clusters/.*", per_page=1)
+        self.assertCountEqual(
+            [call.args[1] for call in get.call_args_list], list(pages)
+        )
+        self.assertListEqual(
+            [entry["path"] for entry in matrix],
+            ["clusters/live/app", "clusters/staging/app", "clusters/staging/demo"],
+        )
+
+    def test_pagination_next_link(self):
+        pages = {
+            self.compare_url: (
+                {"files": [CLUSTERS_FILES[0]]},
+                {"next": {"url": self.page_url % 2}},
+            ),
+            self.page_url % 2: ({"files": [CLUSTERS_FILES[1]]}, {}),
+        }
+        with self.mock_get(pages) as get:
+            matrix = self.main(include_regex="clusters/.*", per_page=1)
+        self.assertEqual(get.call_count, 2)
+        self.assertListEqual(
+            [entry["path"] for entry in matrix],
+            ["clusters/live/app", "clusters/staging/app"],
+        )
+
+
+@unittest.skipUnless(
+    os.getenv("RUN_INTEGRATION_TESTS") and os.getenv("GITHUB_TOKEN"),
+    "set RUN_INTEGRATION_TESTS and GITHUB_TOKEN to call the GitHub API",
+)
 class IntegrationTest(unittest.TestCase):
     empty_repo_commit_sha = "6b5794416e6750d16fb126a04eadb681349e6947"
     initial_import_commit_sha = "191fe221420a833dc9a43d3338c1d94ccab94ea6"
 
-    def test_basic(self):
-        matrix = neo.main(
+    @classmethod
+    def setUpClass(cls):
+        # shared by the tests, to call the API only once
+        cls.unpaginated_result = neo.main(
             os.getenv("GITHUB_TOKEN"),
             "hellofresh/action-changed-files",
-            self.empty_repo_commit_sha,
-            self.initial_import_commit_sha,
+            cls.empty_repo_commit_sha,
+            cls.initial_import_commit_sha,
             ".*",
         )
-        self.assertEqual(len(matrix), 5)
+
+    def test_basic(self):
+        self.assertEqual(len(self.unpaginated_result), 5)
 
     def test_pagination(self):
-        unpaginated_result = neo.main(
-            os.getenv("GITHUB_TOKEN"),
-            "hellofresh/action-changed-files",
-            self.empty_repo_commit_sha,
-            self.initial_import_commit_sha,
-            ".*",
-        )
         paginated_result = neo.main(
             os.getenv("GITHUB_TOKEN"),
             "hellofresh/action-changed-files",
@@ -234,7 +527,7 @@ class IntegrationTest(unittest.TestCase):
             ".*",
             per_page=1,
         )
-        self.assertListEqual(unpaginated_result, paginated_result)
+        self.assertListEqual(self.unpaginated_result, paginated_result)
 
 
 if __name__ == "__main__":